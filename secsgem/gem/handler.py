@@ -25,6 +25,34 @@ from ..secs.handler import SecsHandler
 class GemHandler(SecsHandler):
     """Baseclass for creating Host/Equipment models. This layer contains GEM functionality."""
 
+    # communication state machine definition, shared between all instances.
+    # not going to HOST_INITIATED_CONNECT because fysom doesn't support two states.
+    # but there is a transistion to get out of EQUIPMENT_INITIATED_CONNECT when the HOST_INITIATED_CONNECT happens
+    _COMMUNICATION_STATE_INITIAL = 'DISABLED'  # 1
+
+    _COMMUNICATION_STATE_EVENTS = [
+        {'name': 'enable', 'src': 'DISABLED', 'dst': 'ENABLED'},  # 2
+        {'name': 'disable', 'src': ['ENABLED', 'NOT_COMMUNICATING', 'COMMUNICATING',
+                                    'EQUIPMENT_INITIATED_CONNECT', 'WAIT_DELAY', 'WAIT_CRA',
+                                    "HOST_INITIATED_CONNECT", "WAIT_CR_FROM_HOST"], 'dst': 'DISABLED'},  # 3
+        {'name': 'select', 'src': 'NOT_COMMUNICATING', 'dst': 'EQUIPMENT_INITIATED_CONNECT'},  # 5
+        {'name': 'communicationreqfail', 'src': 'WAIT_CRA', 'dst': 'WAIT_DELAY'},  # 6
+        {'name': 'delayexpired', 'src': 'WAIT_DELAY', 'dst': 'WAIT_CRA'},  # 7
+        {'name': 'messagereceived', 'src': 'WAIT_DELAY', 'dst': 'WAIT_CRA'},  # 8
+        {'name': 's1f14received', 'src': 'WAIT_CRA', 'dst': 'COMMUNICATING'},  # 9
+        {'name': 'communicationfail', 'src': 'COMMUNICATING', 'dst': 'NOT_COMMUNICATING'},  # 14
+        # 15 (WAIT_CR_FROM_HOST is running in background - AND state -
+        # so if s1f13 is received we go all communicating)
+        {'name': 's1f13received', 'src': ['WAIT_CR_FROM_HOST', 'WAIT_DELAY', 'WAIT_CRA'],
+         'dst': 'COMMUNICATING'},
+    ]
+
+    _COMMUNICATION_STATE_AUTOFORWARD = [
+        {'src': 'ENABLED', 'dst': 'NOT_COMMUNICATING'},  # 4
+        {'src': 'EQUIPMENT_INITIATED_CONNECT', 'dst': 'WAIT_CRA'},  # 5
+        {'src': 'HOST_INITIATED_CONNECT', 'dst': 'WAIT_CR_FROM_HOST'},  # 10
+    ]
+
     def __init__(self, address, port, active, session_id, name, custom_connection_handler=None):
         """
         Initialize a gem handler.
@@ -53,26 +81,19 @@ class GemHandler(SecsHandler):
 
         self.isHost = True
 
-        # not going to HOST_INITIATED_CONNECT because fysom doesn't support two states.
-        # but there is a transistion to get out of EQUIPMENT_INITIATED_CONNECT when the HOST_INITIATED_CONNECT happens
+        # cache for the stream/function classes used in the communication handshake,
+        # filled on first use so subclasses can replace entries in secsStreamsFunctions
+        # after construction
+        self._handshakeFunctions = {}
+
+        # lock protecting the communication state machine against concurrent transitions.
+        # reentrant because state callbacks fire inside the transition and may read the state.
+        self._communicationStateLock = threading.RLock()
+
+        # only the callbacks are instance specific, the state and event tables are shared class-level
         self.communicationState = Fysom({
-            'initial': 'DISABLED',  # 1
-            'events': [
-                {'name': 'enable', 'src': 'DISABLED', 'dst': 'ENABLED'},  # 2
-                {'name': 'disable', 'src': ['ENABLED', 'NOT_COMMUNICATING', 'COMMUNICATING',
-                                            'EQUIPMENT_INITIATED_CONNECT', 'WAIT_DELAY', 'WAIT_CRA',
-                                            "HOST_INITIATED_CONNECT", "WAIT_CR_FROM_HOST"], 'dst': 'DISABLED'},  # 3
-                {'name': 'select', 'src': 'NOT_COMMUNICATING', 'dst': 'EQUIPMENT_INITIATED_CONNECT'},  # 5
-                {'name': 'communicationreqfail', 'src': 'WAIT_CRA', 'dst': 'WAIT_DELAY'},  # 6
-                {'name': 'delayexpired', 'src': 'WAIT_DELAY', 'dst': 'WAIT_CRA'},  # 7
-                {'name': 'messagereceived', 'src': 'WAIT_DELAY', 'dst': 'WAIT_CRA'},  # 8
-                {'name': 's1f14received', 'src': 'WAIT_CRA', 'dst': 'COMMUNICATING'},  # 9
-                {'name': 'communicationfail', 'src': 'COMMUNICATING', 'dst': 'NOT_COMMUNICATING'},  # 14
-                # 15 (WAIT_CR_FROM_HOST is running in background - AND state -
-                # so if s1f13 is received we go all communicating)
-                {'name': 's1f13received', 'src': ['WAIT_CR_FROM_HOST', 'WAIT_DELAY', 'WAIT_CRA'],
-                 'dst': 'COMMUNICATING'},
-            ],
+            'initial': self._COMMUNICATION_STATE_INITIAL,
+            'events': self._COMMUNICATION_STATE_EVENTS,
             'callbacks': {
                 'onWAIT_CRA': self._on_state_wait_cra,
                 'onWAIT_DELAY': self._on_state_wait_delay,
@@ -81,20 +102,26 @@ class GemHandler(SecsHandler):
                 'onCOMMUNICATING': self._on_state_communicating,
                 # 'onselect': self.onStateSelect,
             },
-            'autoforward': [
-                {'src': 'ENABLED', 'dst': 'NOT_COMMUNICATING'},  # 4
-                {'src': 'EQUIPMENT_INITIATED_CONNECT', 'dst': 'WAIT_CRA'},  # 5
-                {'src': 'HOST_INITIATED_CONNECT', 'dst': 'WAIT_CR_FROM_HOST'},  # 10
-            ]
+            'autoforward': self._COMMUNICATION_STATE_AUTOFORWARD,
         })
 
         self.waitCRATimer = None
         self.commDelayTimer = None
+
+        # generation counters guarding the timers, a fired timer belonging to a superseded
+        # generation is ignored instead of triggering a transition for a state already left
+        self._timerLock = threading.Lock()
+        self._waitCRATimerGeneration = 0
+        self._commDelayTimerGeneration = 0
         self.establishCommunicationTimeout = 10
 
         self.reportIDCounter = 1000
 
-        self.waitEventList = []
+        self.waitEventList = set()
+        self._waitEventListLock = threading.Lock()
+
+        # cached on_commack_requested result, valid for a single handshake window
+        self._commackRequestedCache = None
 
     def __repr__(self):
         """Generate textual representation for an object of this class."""
@@ -116,14 +143,18 @@ class GemHandler(SecsHandler):
     def enable(self):
         """Enables the connection."""
         self.connection.enable()
-        self.communicationState.enable()
+
+        with self._communicationStateLock:
+            self.communicationState.enable()
 
         self.logger.info("Connection enabled")
 
     def disable(self):
         """Disables the connection."""
-        self.connection.disable()
-        self.communicationState.disable()
+        SecsHandler.disable(self)
+
+        with self._communicationStateLock:
+            self.communicationState.disable()
 
         self.logger.info("Connection disabled")
 
@@ -134,38 +165,65 @@ class GemHandler(SecsHandler):
         :param packet: received data packet
         :type packet: :class:`secsgem.HsmsPacket`
         """
-        if self.communicationState.isstate('WAIT_CRA'):
+        state = self.communicationState.current
+
+        if state == 'WAIT_CRA':
             if packet.header.stream == 1 and packet.header.function == 13:
                 if self.isHost:
-                    self.send_response(self.stream_function(1, 14)({"COMMACK": self.on_commack_requested(),
-                                                                    "MDLN": []}),
+                    self.send_response(self._handshake_function(1, 14)({"COMMACK": self._cached_commack_requested(),
+                                                                        "MDLN": []}),
                                        packet.header.system)
                 else:
-                    self.send_response(self.stream_function(1, 14)({"COMMACK": self.on_commack_requested(),
-                                                                    "MDLN": [self.MDLN, self.SOFTREV]}),
+                    self.send_response(self._handshake_function(1, 14)({"COMMACK": self._cached_commack_requested(),
+                                                     "MDLN": [self.MDLN, self.SOFTREV]}),
                                        packet.header.system)
 
-                self.communicationState.s1f13received()
+                with self._communicationStateLock:
+                    self.communicationState.s1f13received()
             elif packet.header.stream == 1 and packet.header.function == 14:
-                self.communicationState.s1f14received()
-        elif self.communicationState.isstate('WAIT_DELAY'):
+                with self._communicationStateLock:
+                    self.communicationState.s1f14received()
+        elif state == 'WAIT_DELAY':
             pass
-        elif self.communicationState.isstate('COMMUNICATING'):
-            threading.Thread(target=self._handle_stream_function, args=(packet, ),
-                             name="secsgem_gemHandler_callback_S{}F{}".format(packet.header.stream,
-                                                                              packet.header.function)).start()
+        elif state == 'COMMUNICATING':
+            self._queue_stream_function_callback(packet)
 
     def _on_hsms_select(self):
         """Selected received from hsms layer."""
-        self.communicationState.select()
+        with self._communicationStateLock:
+            self.communicationState.select()
 
-    def _on_wait_cra_timeout(self):
-        """Linktest time timed out, so send linktest request."""
-        self.communicationState.communicationreqfail()
+    def _on_wait_cra_timeout(self, generation):
+        """
+        Wait CRA timer timed out, communication request failed.
 
-    def _on_wait_comm_delay_timeout(self):
-        """Linktest time timed out, so send linktest request."""
-        self.communicationState.delayexpired()
+        :param generation: timer generation the timeout belongs to
+        :type generation: integer
+        """
+        # communication state lock first, then the generation check, so a transition leaving
+        # WAIT_CRA cannot slip in between the check and the firing of the stale timer
+        with self._communicationStateLock:
+            with self._timerLock:
+                if generation != self._waitCRATimerGeneration:
+                    return
+
+            self.communicationState.communicationreqfail()
+
+    def _on_wait_comm_delay_timeout(self, generation):
+        """
+        Communication delay timer timed out, delay expired.
+
+        :param generation: timer generation the timeout belongs to
+        :type generation: integer
+        """
+        # communication state lock first, then the generation check, so a transition leaving
+        # WAIT_DELAY cannot slip in between the check and the firing of the stale timer
+        with self._communicationStateLock:
+            with self._timerLock:
+                if generation != self._commDelayTimerGeneration:
+                    return
+
+            self.communicationState.delayexpired()
 
     def _on_state_wait_cra(self, _):
         """
@@ -176,13 +234,16 @@ class GemHandler(SecsHandler):
         """
         self.logger.debug("connectionState -> WAIT_CRA")
 
-        self.waitCRATimer = threading.Timer(self.connection.T3, self._on_wait_cra_timeout)
-        self.waitCRATimer.start()
+        with self._timerLock:
+            self._waitCRATimerGeneration += 1
+            self.waitCRATimer = threading.Timer(self.connection.T3, self._on_wait_cra_timeout,
+                                                args=(self._waitCRATimerGeneration, ))
+            self.waitCRATimer.start()
 
         if self.isHost:
-            self.send_stream_function(self.stream_function(1, 13)())
+            self.send_stream_function(self._handshake_function(1, 13)())
         else:
-            self.send_stream_function(self.stream_function(1, 13)([self.MDLN, self.SOFTREV]))
+            self.send_stream_function(self._handshake_function(1, 13)([self.MDLN, self.SOFTREV]))
 
     def _on_state_wait_delay(self, _):
         """
@@ -193,8 +254,12 @@ class GemHandler(SecsHandler):
         """
         self.logger.debug("connectionState -> WAIT_DELAY")
 
-        self.commDelayTimer = threading.Timer(self.establishCommunicationTimeout, self._on_wait_comm_delay_timeout)
-        self.commDelayTimer.start()
+        with self._timerLock:
+            self._commDelayTimerGeneration += 1
+            self.commDelayTimer = threading.Timer(self.establishCommunicationTimeout,
+                                                  self._on_wait_comm_delay_timeout,
+                                                  args=(self._commDelayTimerGeneration, ))
+            self.commDelayTimer.start()
 
     def _on_state_leave_wait_cra(self, _):
         """
@@ -203,8 +268,13 @@ class GemHandler(SecsHandler):
         :param data: event attributes
         :type data: object
         """
-        if self.waitCRATimer is not None:
-            self.waitCRATimer.cancel()
+        self._commackRequestedCache = None
+
+        with self._timerLock:
+            self._waitCRATimerGeneration += 1
+
+            if self.waitCRATimer is not None:
+                self.waitCRATimer.cancel()
 
     def _on_state_leave_wait_delay(self, _):
         """
@@ -213,8 +283,11 @@ class GemHandler(SecsHandler):
         :param data: event attributes
         :type data: object
         """
-        if self.commDelayTimer is not None:
-            self.commDelayTimer.cancel()
+        with self._timerLock:
+            self._commDelayTimerGeneration += 1
+
+            if self.commDelayTimer is not None:
+                self.commDelayTimer.cancel()
 
     def _on_state_communicating(self, _):
         """
@@ -227,7 +300,11 @@ class GemHandler(SecsHandler):
 
         self.events.fire("handler_communicating", {'handler': self})
 
-        for event in self.waitEventList:
+        # snapshot under lock, set the events outside to not hold the lock across the wakeups
+        with self._waitEventListLock:
+            events = list(self.waitEventList)
+
+        for event in events:
             event.set()
 
     def on_connection_closed(self, connection):
@@ -237,9 +314,51 @@ class GemHandler(SecsHandler):
         # call parent handlers
         SecsHandler.on_connection_closed(self, connection)
 
-        if self.communicationState.current == "COMMUNICATING":
-            # update communication state
-            self.communicationState.communicationfail()
+        self._commackRequestedCache = None
+
+        with self._communicationStateLock:
+            if self.communicationState.current == "COMMUNICATING":
+                # update communication state
+                self.communicationState.communicationfail()
+
+    def _handshake_function(self, stream, function):
+        """
+        Get the class for a handshake stream and function, cached after the first use.
+
+        Resolving on first use instead of at construction honors replacements made in
+        :attr:`secsStreamsFunctions` after the constructor ran, while keeping the
+        registry lookup off the per-handshake path.
+
+        :param stream: stream to get function for
+        :type stream: int
+        :param function: function to get
+        :type function: int
+        :return: matching stream and function class
+        :rtype: secsSxFx class
+        """
+        func = self._handshakeFunctions.get((stream, function))
+
+        if func is None:
+            func = self.stream_function(stream, function)
+            self._handshakeFunctions[(stream, function)] = func
+
+        return func
+
+    def _cached_commack_requested(self):
+        """
+        Get the acknowledgement code for the connection request, cached for the handshake window.
+
+        Repeated S1F13 within one handshake window return the cached result instead of
+        re-evaluating a possibly expensive on_commack_requested override. The cache is
+        cleared when the WAIT_CRA state is left.
+
+        :returns: result of :func:`on_commack_requested`
+        :rtype: integer
+        """
+        if self._commackRequestedCache is None:
+            self._commackRequestedCache = self.on_commack_requested()
+
+        return self._commackRequestedCache
 
     def on_commack_requested(self):
         """
@@ -289,16 +408,24 @@ class GemHandler(SecsHandler):
         :returns: True if state is communicating, False if timed out
         :rtype: bool
         """
+        if self.communicationState.isstate("COMMUNICATING"):
+            return True
+
         event = threading.Event()
-        self.waitEventList.append(event)
 
+        with self._waitEventListLock:
+            self.waitEventList.add(event)
+
+        # re-check the state after registering, the state change might have happened in between
         if self.communicationState.isstate("COMMUNICATING"):
-            self.waitEventList.remove(event)
+            with self._waitEventListLock:
+                self.waitEventList.discard(event)
             return True
 
         result = event.wait(timeout)
 
-        self.waitEventList.remove(event)
+        with self._waitEventListLock:
+            self.waitEventList.discard(event)
 
         return result
 
@@ -314,9 +441,9 @@ class GemHandler(SecsHandler):
         del handler, packet  # unused parameters
 
         if self.isHost:
-            return self.stream_function(1, 2)()
+            return self._handshake_function(1, 2)()
 
-        return self.stream_function(1, 2)([self.MDLN, self.SOFTREV])
+        return self._handshake_function(1, 2)([self.MDLN, self.SOFTREV])
 
     def _on_s01f13(self, handler, packet):
         """
@@ -330,7 +457,7 @@ class GemHandler(SecsHandler):
         del handler, packet  # unused parameters
 
         if self.isHost:
-            return self.stream_function(1, 14)({"COMMACK": self.on_commack_requested(), "MDLN": []})
+            return self._handshake_function(1, 14)({"COMMACK": self._cached_commack_requested(), "MDLN": []})
 
-        return self.stream_function(1, 14)({"COMMACK": self.on_commack_requested(),
-                                            "MDLN": [self.MDLN, self.SOFTREV]})
+        return self._handshake_function(1, 14)({"COMMACK": self._cached_commack_requested(),
+                             "MDLN": [self.MDLN, self.SOFTREV]})
@@ -303,11 +303,13 @@ class HsmsHandler:
         if packet.header.sType > 0:
             self.__handle_hsms_requests(packet)
         else:
-            if hasattr(self, 'secs_decode') and callable(getattr(self, 'secs_decode')):
-                message = self.secs_decode(packet)
-                self.communicationLogger.info("< %s\n%s", packet, message, extra=self._get_log_extra())
-            else:
-                self.communicationLogger.info("< %s", packet, extra=self._get_log_extra())
+            # decoding the packet is only needed for the log message, skip it if the level is filtered
+            if self.communicationLogger.isEnabledFor(logging.INFO):
+                if hasattr(self, 'secs_decode') and callable(getattr(self, 'secs_decode')):
+                    message = self.secs_decode(packet)
+                    self.communicationLogger.info("< %s\n%s", packet, message, extra=self._get_log_extra())
+                else:
+                    self.communicationLogger.info("< %s", packet, extra=self._get_log_extra())
 
             if not self.connectionState.is_CONNECTED_SELECTED():
                 self.logger.warning("received message when not selected")
@@ -15,6 +15,7 @@
 #####################################################################
 """Handler for SECS commands. Used in combination with :class:`secsgem.HsmsHandler.HsmsConnectionManager`."""
 
+import concurrent.futures
 import logging
 import threading
 import copy
@@ -58,8 +59,23 @@ class SecsHandler(HsmsHandler):
 
         self.secsStreamsFunctions = copy.deepcopy(functions.secsStreamsFunctions)
 
+        # cache for generated callback names, avoids string formatting for every received packet
+        self._sfCallbackNames = {}
+
+        self.callbackWorkerCount = 8  #: number of worker threads used for stream/function callbacks
+
+        # worker pool for stream/function callbacks, created on first use and released in disable
+        self._callbackExecutor = None
+        self._callbackExecutorLock = threading.Lock()
+
     def _generate_sf_callback_name(self, stream, function):
-        return "s{stream:02d}f{function:02d}".format(stream=stream, function=function)
+        name = self._sfCallbackNames.get((stream, function))
+
+        if name is None:
+            name = "s{stream:02d}f{function:02d}".format(stream=stream, function=function)
+            self._sfCallbackNames[(stream, function)] = name
+
+        return name
 
     def register_stream_function(self, stream, function, callback):
         """
@@ -211,7 +227,11 @@ class SecsHandler(HsmsHandler):
 
         # return S09F05 if no callback present
         if sf_callback_index not in self._callback_handler:
-            self.logger.warning("unexpected function received %s\n%s", sf_callback_index, packet.header)
+            # pass primitive header fields instead of the header object, formatting it is expensive
+            if self.logger.isEnabledFor(logging.WARNING):
+                self.logger.warning("unexpected function received s%02df%02d", packet.header.stream,
+                                    packet.header.function)
+
             if packet.header.requireResponse:
                 self.send_response(self.stream_function(9, 5)(packet.header.encode()), packet.header.system)
 
@@ -226,6 +246,49 @@ class SecsHandler(HsmsHandler):
             self.logger.exception('Callback aborted because of exception, abort sent')
             self.send_response(self.stream_function(packet.header.stream, 0)(), packet.header.system)
 
+    def _queue_stream_function_callback(self, packet):
+        """
+        Queue the callback handling for a received packet on the worker pool.
+
+        :param packet: received data packet
+        :type packet: :class:`secsgem.hsms.packets.HsmsPacket`
+        """
+        with self._callbackExecutorLock:
+            if self._callbackExecutor is None:
+                # no thread_name_prefix, the keyword is not available on python 3.5
+                self._callbackExecutor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.callbackWorkerCount)
+
+            future = self._callbackExecutor.submit(self._handle_stream_function, packet)
+
+        # log exceptions escaping the worker, they would otherwise vanish in the unretrieved future
+        future.add_done_callback(self._log_callback_exception)
+
+    def _log_callback_exception(self, future):
+        """
+        Log an exception that escaped a stream/function callback worker.
+
+        :param future: completed future of the callback work item
+        :type future: :class:`concurrent.futures.Future`
+        """
+        exception = future.exception()
+
+        if exception is not None:
+            self.logger.error("unhandled exception in stream/function callback", exc_info=exception)
+
+    def _shutdown_callback_executor(self):
+        """Release the callback worker pool, it will be recreated on the next received packet."""
+        with self._callbackExecutorLock:
+            if self._callbackExecutor is not None:
+                self._callbackExecutor.shutdown(wait=False)
+                self._callbackExecutor = None
+
+    def disable(self):
+        """Disables the connection."""
+        HsmsHandler.disable(self)
+
+        self._shutdown_callback_executor()
+
     def _on_hsms_packet_received(self, packet):
         """
         Packet received from hsms layer.
@@ -234,9 +297,7 @@ class SecsHandler(HsmsHandler):
         :type packet: :class:`secsgem.hsms.packets.HsmsPacket`
         """
         # check if callbacks available for this stream and function
-        threading.Thread(
-            target=self._handle_stream_function, args=(packet, ),
-            name="secsgem_secsHandler_callback_S{}F{}".format(packet.header.stream, packet.header.function)).start()
+        self._queue_stream_function_callback(packet)
 
     def disable_ceids(self):
         """Disable all Collection Events."""